@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*
+# cython: language_level=3, boundscheck=False, wraparound=False
+'''Compiled matching of reco pulses to MCPEs.
+'''
+import numpy as np
+cimport numpy as cnp
+
+cnp.import_array()
+
+
+def match_window(const double[::1] pulse_times,
+                 const double[::1] mc_times,
+                 double max_dt):
+    '''Get a mask of pulses which are within a time window of an MCPE.
+
+    Parameters
+    ----------
+    pulse_times : np.ndarray of float64
+        Sorted times of the reco pulses.
+
+    mc_times : np.ndarray of float64
+        Sorted times of the MCPEs.
+
+    max_dt : float
+        A pulse is accepted if it is within a max_dt-Window
+        of an MCPE.
+
+    Returns
+    -------
+    mask : np.ndarray of uint8
+        1 for each accepted pulse, otherwise 0.
+    '''
+    cdef Py_ssize_t num_pulses = pulse_times.shape[0]
+    cdef Py_ssize_t num_mc = mc_times.shape[0]
+    cdef Py_ssize_t i
+    cdef Py_ssize_t j = 0
+    cdef double t
+    mask = np.zeros(num_pulses, dtype=np.uint8)
+    cdef cnp.uint8_t[::1] mask_view = mask
+
+    with nogil:
+        for i in range(num_pulses):
+            t = pulse_times[i]
+            # skip all MCPEs that are too early for this and later pulses
+            while j < num_mc and mc_times[j] <= t - max_dt:
+                j += 1
+            if j < num_mc and mc_times[j] - t < max_dt:
+                mask_view[i] = 1
+    return mask
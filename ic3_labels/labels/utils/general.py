@@ -3,11 +3,14 @@
 '''Helper functions for icecube specific labels.
 '''
 from __future__ import print_function, division
+from collections import deque
+import operator
 import numpy as np
 from icecube import dataclasses, MuonGun, simclasses
 from icecube.phys_services import I3Calculator
 
 from ic3_labels.labels.utils import geometry
+from ic3_labels.labels.utils.pulse_matching import match_pulses
 
 
 def get_num_coincident_events(frame):
@@ -44,9 +47,8 @@ def particle_is_inside(particle, convex_hull):
     bool
         True if particle is inside, otherwise False.
     '''
-    v_pos = (particle.pos.x, particle.pos.y, particle.pos.z)
-    v_dir = (particle.dir.x, particle.dir.y, particle.dir.z)
-    intersection_ts = geometry.get_intersections(convex_hull, v_pos, v_dir)
+    intersection_ts = geometry.get_particle_intersections(convex_hull,
+                                                          particle)
 
     # particle didn't hit convex_hull
     if intersection_ts.size == 0:
@@ -56,10 +58,12 @@ def particle_is_inside(particle, convex_hull):
     #   Expecting two intersections
     #   What happens if track is exactly along edge of hull?
     #   If only one ts: track exactly hit a corner of hull?
-    assert len(intersection_ts) == 2, 'Expected exactly 2 intersections'
+    if __debug__ and len(intersection_ts) != 2:
+        raise ValueError('Expected exactly 2 intersections')
 
-    min_ts = min(intersection_ts)
-    max_ts = max(intersection_ts)
+    min_ts, max_ts = intersection_ts[0], intersection_ts[1]
+    if min_ts > max_ts:
+        min_ts, max_ts = max_ts, min_ts
     if min_ts <= 0 and max_ts >= 0:
         # starting event
         return True
@@ -73,7 +77,49 @@ def particle_is_inside(particle, convex_hull):
     return True
 
 
-def get_ids_of_particle_and_daughters(frame, particle, ids):
+def particles_are_inside(particles, convex_hull):
+    '''Checks which particles are inside the convex hull.
+    Vectorized version of particle_is_inside. Particles which do not
+    hit the convex hull are considered to be outside.
+
+    Parameters
+    ----------
+    particles : list of I3Particle
+        The Particles to check.
+    convex_hull : scipy.spatial.ConvexHull
+        Defines the desired convex volume.
+
+    Returns
+    -------
+    np.ndarray of bool
+        True for each particle that is inside, otherwise False.
+    '''
+    if len(particles) == 0:
+        return np.zeros(0, dtype=bool)
+    v_pos = np.empty((len(particles), 3))
+    v_dir = np.empty((len(particles), 3))
+    lengths = np.empty(len(particles))
+    for i, particle in enumerate(particles):
+        pos = particle.pos
+        direction = particle.dir
+        v_pos[i] = pos.x, pos.y, pos.z
+        v_dir[i] = direction.x, direction.y, direction.z
+        lengths[i] = particle.length
+    min_ts, max_ts = geometry.get_intersections_batch(convex_hull,
+                                                      v_pos, v_dir)
+
+    # particles that didn't hit the convex hull compare False everywhere
+    with np.errstate(invalid='ignore'):
+        # starting particles are inside, otherwise the particle must
+        # not be created after or stop before the convex hull
+        is_inside = np.logical_or(
+            np.logical_and(min_ts <= 0, max_ts >= 0),
+            np.logical_and(max_ts >= 0, ~(min_ts > lengths + 1e-8)))
+    return is_inside
+
+
+def get_ids_of_particle_and_daughters(frame, particle, ids,
+                                      daughter_cache=None):
     '''Get particle ids of particle and all its daughters.
 
     Parameters
@@ -87,6 +133,11 @@ def get_ids_of_particle_and_daughters(frame, particle, ids):
     ids : list,
         List in which to save all ids.
 
+    daughter_cache : dict, optional
+        Maps (majorID, minorID) of a particle to its daughters.
+        May be shared between calls on the same frame to avoid
+        repeated lookups in the I3MCTree.
+
     Returns
     -------
     ids: list
@@ -94,13 +145,166 @@ def get_ids_of_particle_and_daughters(frame, particle, ids):
     '''
     if particle is None:
         return ids
-    ids.append(particle.id)
-    daughters = frame['I3MCTree'].get_daughters(particle)
-    for daughter in daughters:
-        get_ids_of_particle_and_daughters(frame, daughter, ids)
+    mctree = frame['I3MCTree']
+
+    # let the I3MCTree walk the subtree if this version supports it
+    if daughter_cache is None and hasattr(mctree, 'get_descendants'):
+        ids.append(particle.id)
+        ids.extend(p.id for p in mctree.get_descendants(particle))
+        return ids
+
+    get_daughters = mctree.get_daughters
+    queue = deque([particle])
+    while queue:
+        p = queue.popleft()
+        if p is None:
+            continue
+        ids.append(p.id)
+        if daughter_cache is None:
+            queue.extend(get_daughters(p))
+        else:
+            key = (p.id.majorID, p.id.minorID)
+            if key not in daughter_cache:
+                daughter_cache[key] = get_daughters(p)
+            queue.extend(daughter_cache[key])
     return ids
 
 
+def get_id_set(frame, particle, daughter_cache=None):
+    '''Get set of particle ids of particle and all its daughters.
+    Other than get_ids_of_particle_and_daughters, the ids are collected
+    directly into a set, which is suited for membership tests.
+
+    Parameters
+    ----------
+    frame : current frame
+        needed to retrieve MMCTrackList, I3MCTree, I3MCPE...
+
+    particle : I3Particle
+        Any particle type.
+
+    daughter_cache : dict, optional
+        See get_ids_of_particle_and_daughters.
+
+    Returns
+    -------
+    ids: frozenset of tuple of int
+        Set of (majorID, minorID) of all particle ids
+    '''
+    if particle is None:
+        return frozenset()
+    mctree = frame['I3MCTree']
+
+    # let the I3MCTree walk the subtree if this version supports it
+    if daughter_cache is None and hasattr(mctree, 'get_descendants'):
+        ids = {(p.id.majorID, p.id.minorID)
+               for p in mctree.get_descendants(particle)}
+        ids.add((particle.id.majorID, particle.id.minorID))
+        return frozenset(ids)
+
+    get_daughters = mctree.get_daughters
+    ids = set()
+    stack = [particle]
+    while stack:
+        p = stack.pop()
+        if p is None:
+            continue
+        p_id = p.id
+        key = (p_id.majorID, p_id.minorID)
+        ids.add(key)
+        if daughter_cache is None:
+            stack.extend(get_daughters(p))
+        else:
+            if key not in daughter_cache:
+                daughter_cache[key] = get_daughters(p)
+            stack.extend(daughter_cache[key])
+    return frozenset(ids)
+
+
+def _get_shared_keys(frame, pulse_map_string, mcpe_series_map_name):
+    '''Get pulse map, MCPE series map and the keys present in both.
+
+    Parameters
+    ----------
+    frame : current frame
+        needed to retrieve the pulse map and I3MCPE...
+
+    pulse_map_string : key of pulse map in frame,
+        of which the pulses should be computed for
+
+    mcpe_series_map_name : key of mcpe series map in frame
+
+    Returns
+    -------
+    in_ice_pulses : I3RecoPulseSeriesMap
+        The pulses defined by pulse_map_string.
+
+    mcpe_map : I3MCPESeriesMap
+        The MCPE series map.
+
+    shared_keys : set of OMKey
+        Keys which are in both maps.
+    '''
+    # get pulses defined by pulse_map_string
+    in_ice_pulses = frame[pulse_map_string]
+    if isinstance(in_ice_pulses, dataclasses.I3RecoPulseSeriesMapMask):
+        in_ice_pulses = in_ice_pulses.apply(frame)
+
+    # get candidate keys
+    mcpe_map = frame[mcpe_series_map_name]
+    shared_keys = set(in_ice_pulses.keys()).intersection(mcpe_map.keys())
+    return in_ice_pulses, mcpe_map, shared_keys
+
+
+def _get_matched_pulse_map(frame, pulse_map_string, mcpe_series_map_name,
+                           max_time_dif, selected_ids):
+    '''Get map of pulses which are within a time window of selected MCPEs.
+    Shared implementation of get_pulse_map and get_noise_pulse_map.
+
+    Parameters
+    ----------
+    frame : current frame
+        needed to retrieve the pulse map and I3MCPE...
+
+    pulse_map_string : key of pulse map in frame,
+        of which the pulses should be computed for
+
+    mcpe_series_map_name : key of mcpe series map in frame
+
+    max_time_dif : float
+        A pulse is accepted if it is within a max_time_dif-Window
+        of a selected MCPE.
+
+    selected_ids : set of tuple of int
+        (majorID, minorID) of the particles whose MCPEs are selected.
+
+    Returns
+    -------
+    pulse_map : I3RecoPulseSeriesMap
+        Map of pulses.
+    '''
+    # get pulses defined by pulse_map_string and candidate keys
+    in_ice_pulses, mcpe_map, shared_keys = _get_shared_keys(
+        frame, pulse_map_string, mcpe_series_map_name)
+
+    get_time = operator.attrgetter('time')
+
+    pulse_series_map = dataclasses.I3RecoPulseSeriesMap()
+    for key in shared_keys:
+        mc_pulse_times = [p.time for p in mcpe_map[key]
+                          if (p.ID.majorID, p.ID.minorID) in selected_ids]
+        if mc_pulse_times:
+            mc_pulse_times.sort()
+            pulses = list(in_ice_pulses[key])
+            pulse_times = list(map(get_time, pulses))
+            indices = match_pulses(pulse_times, mc_pulse_times,
+                                   max_time_dif)
+            if len(indices) > 0:
+                pulse_series_map[key] = dataclasses.I3RecoPulseSeries(
+                    [pulses[i] for i in indices])
+    return pulse_series_map
+
+
 def get_pulse_map(frame, particle,
                   pulse_map_string='InIcePulses',
                   mcpe_series_map_name='I3MCPESeriesMap',
@@ -137,49 +341,21 @@ def get_pulse_map(frame, particle,
         raise ValueError('Can not get pulse map for particle\
                             with id == (0,0)\n{}'.format(particle))
 
-    particle_pulse_series_map = {}
-    if pulse_map_string in frame:
-        # make a list of all ids
-        ids = get_ids_of_particle_and_daughters(frame, particle, [])
-        # older versions of icecube dont have correct hash for I3ParticleID
-        # Therefore need tuple of major and minor ID
-        # [works directly with I3ParticleID in  Version combo.trunk r152630]
-        ids = {(i.majorID, i.minorID) for i in ids}
-
-        assert (0, 0) not in ids, \
-            'Daughter particle with id (0,0) should not exist'
-
-        # get pulses defined by pulse_map_string
-        in_ice_pulses = frame[pulse_map_string]
-        if isinstance(in_ice_pulses, dataclasses.I3RecoPulseSeriesMapMask):
-            in_ice_pulses = in_ice_pulses.apply(frame)
-
-        # get candidate keys
-        valid_keys = set(frame[mcpe_series_map_name].keys())
-
-        # find all pulses resulting from particle or daughters of particle
-        shared_keys = {key for key in in_ice_pulses.keys()
-                       if key in valid_keys}
-        for key in shared_keys:
-            mc_pulse_times = [p.time for p in frame[mcpe_series_map_name][key]
-                              if (p.ID.majorID, p.ID.minorID) in ids]
-            particle_in_ice_pulses = []
-            if mc_pulse_times:
-                # speed things up:
-                # pulses are sorted in time. Therefore we
-                # can start from the last match
-                last_index = 0
-                for pulse in in_ice_pulses[key]:
-                    # accept a pulse if it's within a
-                    # max_time_dif-Window of an actual MCPE
-                    for i, t in enumerate(mc_pulse_times[last_index:]):
-                        if abs(pulse.time - t) < max_time_dif:
-                            last_index = last_index + i
-                            particle_in_ice_pulses.append(pulse)
-                            break
-            if particle_in_ice_pulses:
-                particle_pulse_series_map[key] = particle_in_ice_pulses
-    return dataclasses.I3RecoPulseSeriesMap(particle_pulse_series_map)
+    if pulse_map_string not in frame:
+        return dataclasses.I3RecoPulseSeriesMap()
+
+    # make a set of all ids
+    # older versions of icecube dont have correct hash for I3ParticleID
+    # Therefore need tuple of major and minor ID
+    # [works directly with I3ParticleID in  Version combo.trunk r152630]
+    ids = get_id_set(frame, particle)
+
+    assert (0, 0) not in ids, \
+        'Daughter particle with id (0,0) should not exist'
+
+    # find all pulses resulting from particle or daughters of particle
+    return _get_matched_pulse_map(frame, pulse_map_string,
+                                  mcpe_series_map_name, max_time_dif, ids)
 
 
 def get_noise_pulse_map(frame,
@@ -208,40 +384,14 @@ def get_noise_pulse_map(frame,
     ----- Better if done over I3RecoPulseSeriesMapMask ----
 
     '''
+    if pulse_map_string not in frame:
+        return dataclasses.I3RecoPulseSeriesMap()
+
+    # pulses with no particle ID are likely from noise
+    empty_id = dataclasses.I3ParticleID()
+    empty_ids = {(empty_id.majorID, empty_id.minorID)}
 
-    noise_pulse_series_map = {}
-    if pulse_map_string in frame:
-        # pulses with no particle ID are likely from noise
-        empty_id = dataclasses.I3ParticleID()
-
-        # get candidate keys
-        valid_keys = set(frame[mcpe_series_map_name].keys())
-
-        # get pulses defined by pulse_map_string
-        in_ice_pulses = frame[pulse_map_string]
-        if isinstance(in_ice_pulses, dataclasses.I3RecoPulseSeriesMapMask):
-            in_ice_pulses = in_ice_pulses.apply(frame)
-
-        # find all pulses resulting from noise
-        shared_keys = {key for key in in_ice_pulses.keys()
-                       if key in valid_keys}
-        for key in shared_keys:
-            mc_pulse_times = [p.time for p in frame[mcpe_series_map_name][key]
-                              if p.ID == empty_id]
-            noise_in_ice_pulses = []
-            if mc_pulse_times:
-                # speed things up:
-                # pulses are sorted in time. Therefore we
-                # can start from the last match
-                last_index = 0
-                for pulse in in_ice_pulses[key]:
-                    # accept a pulse if it's within a
-                    # max_time_dif-Window of an actual MCPE
-                    for i, t in enumerate(mc_pulse_times[last_index:]):
-                        if abs(pulse.time - t) < max_time_dif:
-                            last_index = last_index + i
-                            noise_in_ice_pulses.append(pulse)
-                            break
-            if noise_in_ice_pulses:
-                noise_pulse_series_map[key] = noise_in_ice_pulses
-    return dataclasses.I3RecoPulseSeriesMap(noise_pulse_series_map)
+    # find all pulses resulting from noise
+    return _get_matched_pulse_map(frame, pulse_map_string,
+                                  mcpe_series_map_name, max_time_dif,
+                                  empty_ids)
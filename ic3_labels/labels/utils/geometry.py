@@ -118,6 +118,136 @@ def get_intersections(convex_hull, v_pos, v_dir, eps=1e-4):
     return t_s
 
 
+def get_intersections_batch(convex_hull, v_pos, v_dir):
+    '''Function to get the entry and exit points of many infinite lines
+    and the convex hull. In contrast to get_intersections, the lines are
+    intersected with the half-spaces defined by convex_hull.equations,
+    which allows to handle all lines at once.
+
+    Parameters
+    ----------
+    convex_hull : scipy.spatial.ConvexHull
+        defining the desired convex volume
+
+    v_pos : array-like shape=(n, 3)
+        A point of each line.
+
+    v_dir : array-like shape=(n, 3)
+        Directional vector of each line.
+
+    Returns
+    -------
+    t_min : array-like shape=(n,)
+        Scaling factors for v_dir to get the entry points.
+        NaN if the line does not intersect the convex hull.
+
+    t_max : array-like shape=(n,)
+        Scaling factors for v_dir to get the exit points.
+        NaN if the line does not intersect the convex hull.
+    '''
+    v_pos = np.asarray(v_pos, dtype=float)
+    v_dir = np.asarray(v_dir, dtype=float)
+    planes = _get_hull_planes(_HullKey(convex_hull))
+
+    # line is inside of a facet's half-space for: denom * t <= num
+    denom = v_dir.dot(planes.normals.T)
+    num = -(v_pos.dot(planes.normals.T) + planes.offsets)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_s = num / denom
+    t_min = np.where(denom < 0, t_s, -np.inf).max(axis=1)
+    t_max = np.where(denom > 0, t_s, np.inf).min(axis=1)
+
+    # lines parallel to a facet and outside of it never enter the hull
+    missed = np.logical_or(((denom == 0) & (num < 0)).any(axis=1),
+                           ~(t_min <= t_max))
+    missed = np.logical_or(missed, ~np.isfinite(t_min))
+    missed = np.logical_or(missed, ~np.isfinite(t_max))
+    t_min[missed] = np.nan
+    t_max[missed] = np.nan
+    return t_min, t_max
+
+
+class _HullKey(object):
+    '''Hashable wrapper of a convex hull which compares by identity.
+    '''
+    def __init__(self, convex_hull):
+        self.convex_hull = convex_hull
+
+    def __hash__(self):
+        return id(self.convex_hull)
+
+    def __eq__(self, other):
+        return self.convex_hull is other.convex_hull
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class _HullPlanes(object):
+    '''Contiguous facet normals and offsets of a convex hull.
+    '''
+    def __init__(self, convex_hull):
+        self.normals = np.ascontiguousarray(convex_hull.equations[:, :3])
+        self.offsets = np.ascontiguousarray(convex_hull.equations[:, 3])
+
+
+# memo of _HullPlanes per convex hull, cleared once it holds 8 entries
+_hull_planes_cache = {}
+
+
+def _get_hull_planes(hull_key):
+    '''Get the cached _HullPlanes of the convex hull of hull_key.
+    '''
+    if hull_key not in _hull_planes_cache:
+        if len(_hull_planes_cache) >= 8:
+            _hull_planes_cache.clear()
+        _hull_planes_cache[hull_key] = _HullPlanes(hull_key.convex_hull)
+    return _hull_planes_cache[hull_key]
+
+
+# memo of get_particle_intersections, cleared once it holds 1024 entries
+_intersections_cache = {}
+
+
+def _get_cached_intersections(hull_key, v_pos, v_dir):
+    '''Memoized get_intersections keyed by hull, position and direction.
+    '''
+    key = (hull_key, v_pos, v_dir)
+    if key not in _intersections_cache:
+        if len(_intersections_cache) >= 1024:
+            _intersections_cache.clear()
+        _intersections_cache[key] = get_intersections(hull_key.convex_hull,
+                                                      v_pos, v_dir)
+    return _intersections_cache[key]
+
+
+def get_particle_intersections(convex_hull, particle):
+    '''Function to get the intersections of a particle track with the
+    convex hull. Results are cached for up to 1024 combinations of
+    convex hull, particle position and direction, so that repeated
+    checks of the same particle do not recompute the intersections.
+
+    Parameters
+    ----------
+    convex_hull : scipy.spatial.ConvexHull
+        defining the desired convex volume
+
+    particle : I3Particle
+        The particle whose track is intersected with the convex hull.
+
+    Returns
+    -------
+    t : array-like shape=(n_intersections)
+        See get_intersections()
+    '''
+    pos = particle.pos
+    direction = particle.dir
+    t_s = _get_cached_intersections(_HullKey(convex_hull),
+                                    (pos.x, pos.y, pos.z),
+                                    (direction.x, direction.y, direction.z))
+    return t_s.copy()
+
+
 def point_is_inside(convex_hull,
                     v_pos,
                     default_v_dir=np.array([0., 0., 1.]),
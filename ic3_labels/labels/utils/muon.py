@@ -8,7 +8,7 @@ from icecube import dataclasses, MuonGun, simclasses
 from icecube.phys_services import I3Calculator
 
 from ic3_labels.labels.utils import geometry
-from ic3_labels.labels.utils.general import get_ids_of_particle_and_daughters
+from ic3_labels.labels.utils.general import get_id_set
 from ic3_labels.labels.utils.general import particle_is_inside
 
 
@@ -913,10 +913,11 @@ def get_most_visible_muon_inside(frame, convex_hull,
 
         # create a dictionary that holds all daughter ids of each muon
         possible_ids = {}
+        daughter_cache = {}
         for m in muons:
             # get a set of daughter ids for muon m
-            temp_id_set = {(i.majorID, i.minorID) for i in
-                           get_ids_of_particle_and_daughters(frame, m, [])}
+            temp_id_set = get_id_set(frame, m,
+                                     daughter_cache=daughter_cache)
 
             # fill dictionary
             possible_ids[(m.id.majorID, m.id.minorID)] = temp_id_set
@@ -933,28 +934,31 @@ def get_most_visible_muon_inside(frame, convex_hull,
             in_ice_pulses = in_ice_pulses.apply(frame)
 
         # get candidate keys
-        valid_keys = set(frame[mcpe_series_map_name].keys())
+        mcpe_map = frame[mcpe_series_map_name]
+        valid_keys = set(mcpe_map.keys())
 
         # find all pulses resulting from particle or daughters of particle
         shared_keys = {key for key in in_ice_pulses.keys()
                        if key in valid_keys}
 
         for key in shared_keys:
-            # mc_pulses = [ p for p in frame[mcpe_series_map_name][key]
+            # mc_pulses = [ p for p in mcpe_map[key]
             #                      if p.ID in ids_set]
-            mc_pulses = frame[mcpe_series_map_name][key]
+            mc_pulses = mcpe_map[key]
             pulses = in_ice_pulses[key]
             if mc_pulses:
                 # speed things up:
                 # pulses are sorted in time. Therefore we
                 # can start from the last match
                 last_index = 0
+                num_mc_pulses = len(mc_pulses)
                 for pulse in pulses:
                     # accept a pulse if it's within a
                     # max_time_dif-Window of an actual MCPE
-                    for i, p in enumerate(mc_pulses[last_index:]):
+                    for j in range(last_index, num_mc_pulses):
+                        p = mc_pulses[j]
                         if abs(pulse.time - p.time) < max_time_dif:
-                            last_index = last_index + i
+                            last_index = j
                             for ID in ids:
                                 if (p.ID.majorID, p.ID.minorID) in \
                                         possible_ids[(ID.majorID, ID.minorID)]:
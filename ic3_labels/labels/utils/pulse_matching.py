@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+'''Helper functions to match reco pulses to MCPEs in time.
+'''
+from __future__ import print_function, division
+from bisect import bisect_left
+import numpy as np
+
+# Try to import the compiled pulse matching, otherwise fall back to numba
+try:
+    from ic3_labels.labels.utils._pulse_match import match_window
+except ImportError:
+    match_window = None
+
+# numba is only needed if the compiled extension is missing
+njit = None
+if match_window is None:
+    try:
+        from numba import njit
+    except ImportError:
+        pass
+
+# below this number of pulses and MCPEs, the NumPy overhead per call is
+# larger than the time spent in a python loop
+_MIN_ARRAY_SIZE = 128
+
+
+if match_window is None and njit is not None:
+    @njit('boolean[:](float64[:], float64[:], float64)',
+          cache=True, fastmath=True)
+    def _match_window_numba(pulse_times, mc_times, max_dt):
+        '''Compiled two-pointer sweep used by match_pulses.
+        Both pulse_times and mc_times must be sorted.
+        '''
+        mask = np.empty(pulse_times.size, np.bool_)
+        num_mc = mc_times.size
+        j = 0
+        for i in range(pulse_times.size):
+            t = pulse_times[i]
+            # skip all MCPEs that are too early for this and later pulses
+            while j < num_mc and mc_times[j] <= t - max_dt:
+                j += 1
+            mask[i] = j < num_mc and mc_times[j] - t < max_dt
+        return mask
+
+    def _match_window(pulse_times, mc_times, max_dt):
+        return _match_window_numba(pulse_times, mc_times, float(max_dt))
+else:
+    _match_window = match_window
+
+
+def match_pulses_sweep(pulse_times, mc_times, max_dt, window_func):
+    '''Get indices of pulses which are within a time window of an MCPE
+    by means of a compiled two-pointer sweep.
+
+    Parameters
+    ----------
+    pulse_times : np.ndarray of float
+        Times of the reco pulses.
+
+    mc_times : np.ndarray of float
+        Sorted times of the MCPEs. Must not be empty.
+
+    max_dt : float
+        A pulse is accepted if it is within a max_dt-Window
+        of an MCPE.
+
+    window_func : callable
+        The sweep, which returns a mask of accepted pulses for sorted
+        pulse and MCPE times.
+
+    Returns
+    -------
+    indices : np.ndarray of int
+        Indices of the accepted pulses.
+    '''
+    # the two-pointer sweeps require sorted pulse times
+    order = None
+    if np.any(pulse_times[1:] < pulse_times[:-1]):
+        order = np.argsort(pulse_times, kind='stable')
+        pulse_times = pulse_times[order]
+
+    indices = window_func(pulse_times, mc_times, max_dt).nonzero()[0]
+
+    if order is not None:
+        indices = np.sort(order[indices])
+    return indices
+
+
+def match_pulses_searchsorted(pulse_times, mc_times, max_dt):
+    '''Get indices of pulses which are within a time window of an MCPE.
+    The nearest MCPE on either side of each pulse is found via a binary
+    search on the sorted MCPE times.
+
+    Parameters
+    ----------
+    pulse_times : np.ndarray of float
+        Times of the reco pulses.
+
+    mc_times : np.ndarray of float
+        Sorted times of the MCPEs. Must not be empty.
+
+    max_dt : float
+        A pulse is accepted if it is within a max_dt-Window
+        of an MCPE.
+
+    Returns
+    -------
+    indices : np.ndarray of int
+        Indices of the accepted pulses.
+    '''
+    idx = np.searchsorted(mc_times, pulse_times)
+    left = np.clip(idx - 1, 0, len(mc_times) - 1)
+    right = np.clip(idx, 0, len(mc_times) - 1)
+    mask = np.logical_or(np.abs(mc_times[left] - pulse_times) < max_dt,
+                         np.abs(mc_times[right] - pulse_times) < max_dt)
+    return mask.nonzero()[0]
+
+
+def match_pulses_bisect(pulse_times, mc_times, max_dt):
+    '''Get indices of pulses which are within a time window of an MCPE.
+    Pure python version of match_pulses_searchsorted, which is faster
+    for DOMs with only a few pulses and MCPEs.
+
+    Parameters
+    ----------
+    pulse_times : list of float
+        Times of the reco pulses.
+
+    mc_times : list of float
+        Sorted times of the MCPEs. Must not be empty.
+
+    max_dt : float
+        A pulse is accepted if it is within a max_dt-Window
+        of an MCPE.
+
+    Returns
+    -------
+    indices : list of int
+        Indices of the accepted pulses.
+    '''
+    indices = []
+    num_mc = len(mc_times)
+    for i, t in enumerate(pulse_times):
+        j = bisect_left(mc_times, t)
+        if (j < num_mc and mc_times[j] - t < max_dt) or \
+                (j > 0 and t - mc_times[j - 1] < max_dt):
+            indices.append(i)
+    return indices
+
+
+def match_pulses(pulse_times, mc_times, max_dt):
+    '''Get indices of pulses which are within a time window of an MCPE.
+    Small inputs are matched in python. Otherwise, if the compiled
+    _pulse_match extension or numba is available, a compiled two-pointer
+    sweep is used, else a vectorized binary search.
+    The result does not depend on the order of the pulses.
+
+    Parameters
+    ----------
+    pulse_times : list or np.ndarray of float
+        Times of the reco pulses.
+
+    mc_times : list or np.ndarray of float
+        Sorted times of the MCPEs. Must not be empty.
+
+    max_dt : float
+        A pulse is accepted if it is within a max_dt-Window
+        of an MCPE.
+
+    Returns
+    -------
+    indices : list or np.ndarray of int
+        Indices of the accepted pulses.
+    '''
+    if len(pulse_times) + len(mc_times) < _MIN_ARRAY_SIZE:
+        return match_pulses_bisect(pulse_times, mc_times, max_dt)
+
+    pulse_times = np.asarray(pulse_times, dtype=np.float64)
+    mc_times = np.asarray(mc_times, dtype=np.float64)
+    if _match_window is not None:
+        return match_pulses_sweep(pulse_times, mc_times, max_dt,
+                                  _match_window)
+    return match_pulses_searchsorted(pulse_times, mc_times, max_dt)
@@ -40,9 +40,7 @@ def get_tau_energy_deposited(frame, convex_hull,
     '''
     if tau is None or first_cascade is None or second_cascade is None:
         return np.nan
-    v_pos = (tau.pos.x, tau.pos.y, tau.pos.z)
-    v_dir = (tau.dir.x, tau.dir.y, tau.dir.z)
-    intersection_ts = geometry.get_intersections(convex_hull, v_pos, v_dir)
+    intersection_ts = geometry.get_particle_intersections(convex_hull, tau)
 
     # tau didn't hit convex_hull
     if intersection_ts.size == 0:
@@ -52,57 +50,50 @@ def get_tau_energy_deposited(frame, convex_hull,
     #   Expecting two intersections
     #   What happens if track is exactly along edge of hull?
     #   If only one ts: track exactly hit a corner of hull?
-    assert len(intersection_ts) == 2, 'Expected exactly 2 intersections'
+    if __debug__ and len(intersection_ts) != 2:
+        raise ValueError('Expected exactly 2 intersections')
 
-    min_ts = min(intersection_ts)
-    max_ts = max(intersection_ts)
-
-    if min_ts <= 0 and max_ts >= 0:
-        # starting track
-        dep_en = first_cascade.energy
-        # If the tau decays before exiting:
-        # - Add the hadronic energy from the second cscd
-        #   and the energy lost by the tau in the detector
-        if max_ts >= tau.length:
-            dep_en += tau.energy - get_muon_energy_at_distance(
-                frame, tau, tau.length - 1e-6)
-            dep_en += second_cascade.energy
-
-        # If the tau exits the detector before decaying:
-        # - Add the energy lost in the detector
-        else:
-            dep_en += tau.energy - get_muon_energy_at_distance(
-                frame, tau, max_ts)
+    min_ts, max_ts = intersection_ts[0], intersection_ts[1]
+    if min_ts > max_ts:
+        min_ts, max_ts = max_ts, min_ts
 
     if max_ts < 0:
         # tau created after the convex hull
         return 0.0
 
-    if min_ts > 0 and max_ts > 0:
+    if min_ts > tau.length:
+        # tau decays before the convex hull
+        return 0.0
+
+    if min_ts <= 0:
+        # starting track
+        dep_en = first_cascade.energy + tau.energy
+    else:
         # Incoming Track
         # Dont count the first cascade
+        dep_en = get_muon_energy_at_distance(frame, tau, min_ts)
+
+    if max_ts >= tau.length:
+        # If the tau decays before exiting:
+        # - Add the hadronic energy from the second cscd
+        #   and the energy lost by the tau in the detector
+        dep_en -= get_muon_energy_at_distance(frame, tau, tau.length - 1e-6)
+        dep_en += second_cascade.energy
+    else:
+        # If the tau exits the detector before decaying:
+        # - Add the energy lost in the detector
+        dep_en -= get_muon_energy_at_distance(frame, tau, max_ts)
 
-        # If the tau decays before exiting
-        # Add the second cascade energy
-        if max_ts >= tau.length:
-            dep_en = get_muon_energy_at_distance(frame, tau, min_ts) - \
-                get_muon_energy_at_distance(frame, tau, tau.length - 1e-6)
-            dep_en += second_cascade.energy
-        # Otherwise just take the energy lost from the tau
-        else:
-            return get_muon_energy_at_distance(frame, tau, min_ts) - \
-                get_muon_energy_at_distance(frame, tau, max_ts)
+    return dep_en
 
 
 def get_nutau_interactions(frame):
     mctree = frame['I3MCTree']
-    # Find all neutrinos InIce
-    in_ice_neutrinos = []
-    for part in mctree:
-        if part.is_neutrino and part.location_type_string == 'InIce':
-            in_ice_neutrinos.append(part)
-    # The first one is the primary neutrino
-    primary_nu = in_ice_neutrinos[0]
+    # The first InIce neutrino is the primary neutrino
+    primary_nu = next((p for p in mctree if p.is_neutrino and
+                       p.location_type_string == 'InIce'), None)
+    if primary_nu is None:
+        raise ValueError('No InIce neutrino found in I3MCTree')
 
     daughters = mctree.get_daughters(primary_nu)
 
@@ -110,11 +101,13 @@ def get_nutau_interactions(frame):
     first_cascade = None
     second_cascade = None
     for daughter in daughters:
-        if daughter.type_string == 'TauMinus' or \
-                daughter.type_string == 'TauPlus':
+        type_string = daughter.type_string
+        if type_string == 'TauMinus' or type_string == 'TauPlus':
             tau = daughter
-        if daughter.type_string == 'Hadrons':
+        elif type_string == 'Hadrons':
             first_cascade = daughter
+        if tau is not None and first_cascade is not None:
+            break
 
     try:
         tau_daughters = mctree.get_daughters(tau)
@@ -1,10 +1,27 @@
 #!/usr/bin/env python
 
-from distutils.core import setup
+from distutils.core import setup, Extension
 exec(compile(open('version.py', "rb").read(),
              'version.py',
              'exec'))
 
+# compile the pulse matching if Cython is available, otherwise (or if the
+# build fails) the python implementation (with optional numba support)
+# is used
+try:
+    import numpy
+    from Cython.Build import cythonize
+    ext_modules = cythonize([
+        Extension('ic3_labels.labels.utils._pulse_match',
+                  ['ic3_labels/labels/utils/_pulse_match.pyx'],
+                  include_dirs=[numpy.get_include()],
+                  extra_compile_args=['-O3'])])
+    # cythonize does not keep the optional flag of the Extension
+    for ext in ext_modules:
+        ext.optional = True
+except ImportError:
+    ext_modules = []
+
 setup(name='ic3_labels',
       version=__version__,
       description='Creates MC labels for IceCube simulation data',
@@ -12,6 +29,7 @@ setup(name='ic3_labels',
       author_email='mirco.huennefeld@tu-dortmund.de',
       url='https://github.com/mhuen/ic3-labels',
       packages=['ic3_labels'],
+      ext_modules=ext_modules,
       install_requires=['numpy', 'click', 'pyyaml',
                         ],
       )
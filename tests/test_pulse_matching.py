@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from ic3_labels.labels.utils import pulse_matching
+
+
+def brute_force(pulse_times, mc_times, max_dt):
+    return [i for i, t in enumerate(pulse_times)
+            if np.any(np.abs(mc_times - t) < max_dt)]
+
+
+def get_backends():
+    backends = [pulse_matching.match_pulses_searchsorted,
+                pulse_matching.match_pulses_bisect,
+                pulse_matching.match_pulses]
+    window_funcs = []
+    if pulse_matching.match_window is not None:
+        window_funcs.append(pulse_matching.match_window)
+    if pulse_matching._match_window not in (None,
+                                            pulse_matching.match_window):
+        window_funcs.append(pulse_matching._match_window)
+    for window_func in window_funcs:
+        backends.append(
+            lambda p, m, dt, f=window_func:
+                pulse_matching.match_pulses_sweep(p, m, dt, f))
+    return backends
+
+
+@pytest.mark.parametrize('backend', get_backends())
+@pytest.mark.parametrize('sort_pulses', [True, False])
+def test_random_cases_match_brute_force(backend, sort_pulses):
+    rng = np.random.RandomState(42)
+    for _ in range(500):
+        pulse_times = rng.uniform(0, 1000, size=rng.randint(0, 100))
+        if sort_pulses:
+            pulse_times.sort()
+        mc_times = np.sort(rng.uniform(0, 1000, size=rng.randint(1, 100)))
+        indices = backend(pulse_times, mc_times, 20.)
+        assert list(indices) == brute_force(pulse_times, mc_times, 20.)
+
+
+@pytest.mark.parametrize('backend', get_backends())
+def test_window_edges_are_excluded(backend):
+    mc_times = np.array([100., 200.])
+    pulse_times = np.array([80., 80.5, 120., 150., 180.5, 220., 219.5, 0.])
+    indices = backend(pulse_times, mc_times, 20.)
+    assert list(indices) == [1, 4, 6]
+    assert list(indices) == brute_force(pulse_times, mc_times, 20.)
+
+
+@pytest.mark.parametrize('backend', get_backends())
+def test_integer_max_dt(backend):
+    mc_times = np.array([100.])
+    pulse_times = np.array([0., 99., 150., 200.])
+    assert list(backend(pulse_times, mc_times, 100)) == [1, 2]
+
+
+def test_lists_are_accepted():
+    pulse_times = [150., 80.5, 0.]
+    mc_times = [100., 200.]
+    assert list(pulse_matching.match_pulses(pulse_times, mc_times, 20.)) \
+        == [1]